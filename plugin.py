@@ -1,19 +1,36 @@
 # -*- coding: utf-8 -*-
+import fnmatch
 import json
-from qgis.PyQt.QtCore import Qt, QSettings, QVariant
+import os
+from qgis.PyQt.QtCore import Qt, QSettings, QVariant, QTimer
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import (
     QAction, QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
     QListWidget, QListWidgetItem, QPushButton, QMessageBox,
     QInputDialog, QDialog, QDialogButtonBox, QFormLayout, QFileDialog,
-    QTableWidget, QTableWidgetItem, QAbstractItemView, QCheckBox
+    QTableWidget, QTableWidgetItem, QAbstractItemView, QCheckBox, QSpinBox
 )
-from qgis.core import QgsProject, QgsVectorLayer, QgsField, Qgis
+from qgis.core import (
+    QgsProject, QgsVectorLayer, QgsField, QgsFeature, QgsFeatureRequest, Qgis,
+    QgsExpression, QgsExpressionNode, QgsExpressionNodeBinaryOperator, QgsExpressionNodeUnaryOperator,
+    QgsExpressionContext, QgsExpressionContextUtils, QgsDataSourceUri, QgsProviderRegistry,
+    QgsVectorDataProvider, QgsVectorLayerUtils, QgsGeometry
+)
+from qgis.gui import QgsExpressionBuilderDialog
+from osgeo import gdal, ogr
 
 SETTINGS_GROUP = "AttributeTemplateFiller"
 TEMPLATES_KEY = "templates_json"
 ACTIVE_KEY = "active_templates_json"
+ALIASES_KEY = "layer_aliases_json"  # layer identity -> storage key
+BINDINGS_KEY = "layer_bindings_json"  # [[identity pattern, storage key], ...]
 LANG_KEY = "ui_language"  # auto/en/ru
+APPLY_CHUNK_SIZE = 10000
+CHILD_LOOKUP_CHUNK = 1000  # parent keys per "already has children" query
+PUSHDOWN_PROVIDERS = ("postgres", "ogr", "spatialite")
+EXTENDS_KEY = "__extends__"  # parent template name
+UNSET_KEY = "__unset__"  # fields removed from the inherited mapping
+CHILDREN_KEY = "__children__"  # relation id -> {"template": child template name, "count": n}
 
 STRINGS = {
     "en": {
@@ -59,6 +76,45 @@ STRINGS = {
         "applied": "Template '{name}' applied to {n} feature(s).",
         "auto_applied": "Auto-applied template '{name}' to new feature.",
         "warn_no_fields": "Template has no matching fields in this layer.",
+        "check_conformance": "Check conformance",
+        "conformance_ok": "All {n} feature(s) conform to template '{name}'.",
+        "conformance_bad": "Template '{name}': {bad} of {n} feature(s) do not conform (selected).\n\nMismatches per field:\n{details}",
+        "create_report_q": "Create a report layer with the non-conforming features?",
+        "report_layer": "Conformance - {name}",
+        "apply_where": "Apply where…",
+        "apply_where_title": "Apply template where",
+        "invalid_expression": "Invalid expression:\n{error}",
+        "applied_db": "Template '{name}' applied in the database to {n} feature(s).",
+        "children_need_editing": "This template creates child records. Start editing the layer to apply it.",
+        "pushdown_failed": "The database rejected the update, applying feature by feature instead: {error}",
+        "extends": "Extends:",
+        "unset": "Unset",
+        "derive": "Derive…",
+        "derive_title": "Derive template",
+        "inherit_cycle": "Template '{name}' cannot extend '{parent}': inheritance cycle.",
+        "name_exists": "A template named '{name}' already exists.",
+        "delete_in_use": "Template '{name}' is used by: {names}.\nChange or delete those templates first.",
+        "template_unresolved": "Template '{name}' cannot be resolved (missing or cyclic inheritance).",
+        "link": "Link to…",
+        "link_title": "Link layer templates",
+        "link_prompt": "Use templates stored under:",
+        "bind": "Bind pattern…",
+        "bind_title": "Bind templates to layers",
+        "bind_prompt": "Layers whose identity matches the pattern (* and ? wildcards) use this layer's templates.\nThis layer: {identity}",
+        "unlink": "Unlink",
+        "unbind": "Unbind…",
+        "bind_shadowed": "{n} matching layer(s) keep their own templates: {names}",
+        "unbind_title": "Remove binding",
+        "unbind_prompt": "Binding to remove (affects every layer that matches it):",
+        "no_bindings": "No binding pattern matches this layer.",
+        "children": "Child records (relations):",
+        "relation": "Relation",
+        "child_template": "Child template",
+        "count": "Count",
+        "children_added": "Created {n} child record(s).",
+        "children_exist": "{n} feature(s) already have child records for relation '{relation}' and were skipped.",
+        "children_no_key": "{n} feature(s) have no value for the key of relation '{relation}'; child records were not created for them.",
+        "child_not_editable": "Layer '{layer}' cannot be edited; child records were not created.",
                 "pk_skip": "Note: primary key fields (e.g., fid/id) are skipped to avoid UNIQUE constraint errors.",
 "restart_needed": "Restart QGIS (or reload the plugin) to fully apply language changes."
     },
@@ -105,6 +161,45 @@ STRINGS = {
         "applied": "Шаблон «{name}» применён к объектам: {n}.",
         "auto_applied": "Авто-применение шаблона «{name}» к новому объекту.",
         "warn_no_fields": "В шаблоне нет полей, совпадающих с полями слоя.",
+        "check_conformance": "Проверить соответствие",
+        "conformance_ok": "Все объекты ({n}) соответствуют шаблону «{name}».",
+        "conformance_bad": "Шаблон «{name}»: не соответствуют {bad} из {n} объектов (выделены).\n\nНесовпадения по полям:\n{details}",
+        "create_report_q": "Создать слой-отчёт с несоответствующими объектами?",
+        "report_layer": "Соответствие - {name}",
+        "apply_where": "Применить по условию…",
+        "apply_where_title": "Применить шаблон по условию",
+        "invalid_expression": "Некорректное выражение:\n{error}",
+        "applied_db": "Шаблон «{name}» применён в базе данных к объектам: {n}.",
+        "children_need_editing": "Шаблон создаёт дочерние записи. Включите режим редактирования слоя, чтобы применить его.",
+        "pushdown_failed": "База данных отклонила обновление, применяется пообъектно: {error}",
+        "extends": "Наследует:",
+        "unset": "Сброс",
+        "derive": "Наследовать…",
+        "derive_title": "Наследовать шаблон",
+        "inherit_cycle": "Шаблон «{name}» не может наследовать «{parent}»: цикл наследования.",
+        "name_exists": "Шаблон «{name}» уже существует.",
+        "delete_in_use": "Шаблон «{name}» используется в: {names}.\nСначала измените или удалите эти шаблоны.",
+        "template_unresolved": "Не удалось собрать шаблон «{name}» (отсутствует или циклическое наследование).",
+        "link": "Связать с…",
+        "link_title": "Связать шаблоны слоя",
+        "link_prompt": "Использовать шаблоны, сохранённые под ключом:",
+        "bind": "Привязать по шаблону…",
+        "bind_title": "Привязка шаблонов к слоям",
+        "bind_prompt": "Слои, идентификатор которых совпадает с шаблоном (символы * и ?), используют шаблоны этого слоя.\nЭтот слой: {identity}",
+        "unlink": "Отвязать",
+        "unbind": "Удалить привязку…",
+        "bind_shadowed": "Подходящие слои ({n}) сохраняют собственные шаблоны: {names}",
+        "unbind_title": "Удалить привязку",
+        "unbind_prompt": "Привязка для удаления (действует на все подходящие слои):",
+        "no_bindings": "Для этого слоя нет привязок по шаблону.",
+        "children": "Дочерние записи (отношения):",
+        "relation": "Отношение",
+        "child_template": "Дочерний шаблон",
+        "count": "Кол-во",
+        "children_added": "Создано дочерних записей: {n}.",
+        "children_exist": "У объектов ({n}) уже есть дочерние записи отношения «{relation}», они пропущены.",
+        "children_no_key": "У объектов ({n}) нет значения ключа отношения «{relation}»; дочерние записи для них не созданы.",
+        "child_not_editable": "Слой «{layer}» нельзя редактировать; дочерние записи не созданы.",
                 "pk_skip": "Важно: поля первичного ключа (например fid/id) пропускаются, чтобы не было ошибки UNIQUE constraint.",
 "restart_needed": "Перезапустите QGIS (или перезагрузите плагин), чтобы полностью применить смену языка."
     }
@@ -134,9 +229,52 @@ def _safe_json_load(s, default):
     except Exception:
         return default
 
-def _layer_key(layer: QgsVectorLayer) -> str:
+def _legacy_layer_key(layer: QgsVectorLayer) -> str:
     return f"{layer.providerType()}::{layer.source()}"
 
+FILE_PROVIDERS = ("ogr", "spatialite")
+DB_PROVIDERS = ("postgres", "mssql", "oracle")
+
+def _layer_identity(layer: QgsVectorLayer) -> str:
+    # credential-free, but keeps the file path / server so same-named datasets don't share templates
+    provider = layer.providerType()
+    source = layer.source()
+    try:
+        if provider in DB_PROVIDERS:
+            uri = QgsDataSourceUri(source)
+            table = uri.table()
+            if table and not table.startswith("("):
+                server = f"service={uri.service()}" if uri.service() else f"{uri.host()}:{uri.port()}"
+                return f"{provider}::{server}/{uri.database()}/{uri.schema()}/{table}"
+        elif provider == "spatialite":
+            uri = QgsDataSourceUri(source)
+            if uri.database() and uri.table():
+                return f"spatialite::{uri.database()}|{uri.table()}"
+        elif provider == "ogr":
+            parts = QgsProviderRegistry.instance().decodeUri("ogr", source)
+            path = parts.get("path") or ""
+            sub = parts.get("layerName") or parts.get("layerId")
+            if path:
+                return f"ogr::{path}|{sub}" if sub not in (None, "") else f"ogr::{path}"
+    except Exception:
+        pass
+    return f"{provider}::{QgsDataSourceUri.removePassword(source)}"
+
+def _short_identity(key: str) -> str:
+    # identity without file directory / server, used only to find relink candidates
+    provider, _, rest = key.partition("::")
+    if provider in FILE_PROVIDERS:
+        path, sep, sub = rest.partition("|")
+        return f"{provider}::{os.path.basename(path)}{sep}{sub}"
+    if provider in DB_PROVIDERS:
+        return f"{provider}::{rest.partition('/')[2]}"
+    return key
+
+def _identity_file_missing(key: str) -> bool:
+    provider, _, rest = key.partition("::")
+    path = rest.partition("|")[0]
+    return provider in FILE_PROVIDERS and not path.startswith("/vsi") and not os.path.exists(path)
+
 
 def _pk_indexes(layer: QgsVectorLayer):
     try:
@@ -149,10 +287,347 @@ def _looks_like_pk_field(name: str) -> bool:
     n = (name or "").strip().lower()
     return n in ("fid", "id", "ogc_fid", "objectid", "object_id", "pk")
 
+def _is_reserved_key(key: str) -> bool:
+    return key.startswith("__") and key.endswith("__")
+
+def _template_targets(layer: QgsVectorLayer, mapping: dict):
+    fields = layer.fields()
+    pk = _pk_indexes(layer)
+    targets = []
+    for field_name, value in mapping.items():
+        idx = fields.indexOf(field_name)
+        if idx < 0 or idx in pk or _looks_like_pk_field(field_name):
+            continue
+        targets.append((idx, field_name, value))
+    return targets
+
+def _is_null(v) -> bool:
+    return v is None or (isinstance(v, QVariant) and v.isNull())
+
+def _comparable(v):
+    # normalizes provider values and template values to one comparable form
+    if _is_null(v):
+        return None
+    if isinstance(v, bool):
+        return v
+    if isinstance(v, (int, float)):
+        return float(v)
+    if hasattr(v, "toString"):  # QDate / QTime / QDateTime
+        return v.toString(Qt.ISODate)
+    return str(v)
+
+_SQL_LOGICAL_OPS = {
+    QgsExpressionNodeBinaryOperator.boOr: "OR",
+    QgsExpressionNodeBinaryOperator.boAnd: "AND",
+}
+# only translated when both operands are numeric or both are not; QGIS compares "5" = 5 numerically
+_SQL_COMPARISON_OPS = {
+    QgsExpressionNodeBinaryOperator.boEQ: "=",
+    QgsExpressionNodeBinaryOperator.boNE: "<>",
+    QgsExpressionNodeBinaryOperator.boLE: "<=",
+    QgsExpressionNodeBinaryOperator.boGE: ">=",
+    QgsExpressionNodeBinaryOperator.boLT: "<",
+    QgsExpressionNodeBinaryOperator.boGT: ">",
+}
+# QGIS LIKE is case-sensitive, SQLite LIKE is not, so these are only pushed down to PostgreSQL
+_SQL_LIKE_OPS = {
+    QgsExpressionNodeBinaryOperator.boLike: "LIKE",
+    QgsExpressionNodeBinaryOperator.boNotLike: "NOT LIKE",
+}
+# only translated when the right operand is NULL; QGIS "a IS 5" means "a = 5"
+_SQL_NULL_OPS = {
+    QgsExpressionNodeBinaryOperator.boIs: "IS",
+    QgsExpressionNodeBinaryOperator.boIsNot: "IS NOT",
+}
+# only translated for numeric operands; QGIS "+" concatenates strings
+_SQL_NUMERIC_OPS = {
+    QgsExpressionNodeBinaryOperator.boPlus: "+",
+    QgsExpressionNodeBinaryOperator.boMinus: "-",
+    QgsExpressionNodeBinaryOperator.boMul: "*",
+}
+
+def _sql_literal(v, provider: str):
+    if _is_null(v):
+        return "NULL"
+    if isinstance(v, bool):
+        if provider == "postgres":
+            return "TRUE" if v else "FALSE"
+        return "1" if v else "0"
+    if isinstance(v, (int, float)):
+        return repr(v)
+    if isinstance(v, str):
+        return "'" + v.replace("'", "''") + "'"
+    return None
+
+def _expression_to_sql(expression: QgsExpression, layer: QgsVectorLayer):
+    # only a conservative subset is translated; anything else falls back to the iterator
+    fields = layer.fields()
+    provider = layer.providerType()
+
+    def walk(node):
+        # returns (sql, is_numeric) or None when the node can't be translated faithfully
+        t = node.nodeType()
+        if t == QgsExpressionNode.ntColumnRef:
+            idx = fields.indexOf(node.name())
+            if idx < 0:
+                return None
+            return QgsExpression.quotedColumnRef(node.name()), fields.at(idx).isNumeric()
+        if t == QgsExpressionNode.ntLiteral:
+            v = node.value()
+            lit = _sql_literal(v, provider)
+            if lit is None:
+                return None
+            return lit, isinstance(v, (int, float)) and not isinstance(v, bool)
+        if t == QgsExpressionNode.ntUnaryOperator:
+            inner = walk(node.operand())
+            if inner is None:
+                return None
+            if node.op() == QgsExpressionNodeUnaryOperator.uoNot:
+                return f"(NOT {inner[0]})", False
+            if node.op() == QgsExpressionNodeUnaryOperator.uoMinus and inner[1]:
+                return f"(-{inner[0]})", True
+            return None
+        if t == QgsExpressionNode.ntBinaryOperator:
+            left, right = walk(node.opLeft()), walk(node.opRight())
+            if left is None or right is None:
+                return None
+            op = node.op()
+            if op in _SQL_LOGICAL_OPS:
+                return f"({left[0]} {_SQL_LOGICAL_OPS[op]} {right[0]})", False
+            if op in _SQL_COMPARISON_OPS and left[1] == right[1]:
+                return f"({left[0]} {_SQL_COMPARISON_OPS[op]} {right[0]})", False
+            if op in _SQL_LIKE_OPS and provider == "postgres":
+                return f"({left[0]} {_SQL_LIKE_OPS[op]} {right[0]})", False
+            if op in _SQL_NULL_OPS and right[0] == "NULL":
+                return f"({left[0]} {_SQL_NULL_OPS[op]} NULL)", False
+            if op in _SQL_NUMERIC_OPS and left[1] and right[1]:
+                return f"({left[0]} {_SQL_NUMERIC_OPS[op]} {right[0]})", True
+            return None
+        if t == QgsExpressionNode.ntInOperator:
+            inner = walk(node.node())
+            items = [walk(n) for n in node.list().list()]
+            if inner is None or not items or any(i is None or i[1] != inner[1] for i in items):
+                return None
+            return f"({inner[0]} {'NOT IN' if node.isNotIn() else 'IN'} ({', '.join(i[0] for i in items)}))", False
+        return None
+
+    if expression.hasParserError() or expression.rootNode() is None:
+        return None
+    result = walk(expression.rootNode())
+    return result[0] if result else None
+
+def _sql_table(layer: QgsVectorLayer):
+    provider = layer.providerType()
+    if provider in ("postgres", "spatialite"):
+        uri = QgsDataSourceUri(layer.source())
+        table = uri.table()
+        if not table or table.startswith("("):  # query layers can't be updated
+            return None
+        ref = QgsExpression.quotedColumnRef(table)
+        if provider == "postgres" and uri.schema():
+            ref = f"{QgsExpression.quotedColumnRef(uri.schema())}.{ref}"
+        return ref
+    if provider == "ogr":
+        parts = QgsProviderRegistry.instance().decodeUri("ogr", layer.source())
+        path = parts.get("path") or ""
+        table = parts.get("layerName")
+        if not path.lower().endswith(".gpkg") or not table:
+            return None
+        return QgsExpression.quotedColumnRef(table)
+    return None
+
+def _sql_connection(layer: QgsVectorLayer):
+    try:
+        md = QgsProviderRegistry.instance().providerMetadata(layer.providerType())
+        return md.createConnection(layer.source(), {}) if md is not None else None
+    except Exception:
+        return None
+
+def _sqlite_path(layer: QgsVectorLayer):
+    if layer.providerType() == "ogr":
+        return QgsProviderRegistry.instance().decodeUri("ogr", layer.source()).get("path")
+    if layer.providerType() == "spatialite":
+        return QgsDataSourceUri(layer.source()).database()
+    return None
+
+def _sql_update(layer: QgsVectorLayer, table: str, assignments: str, where: str) -> int:
+    # one statement/transaction, so the reported count is exactly what was updated
+    if layer.providerType() == "postgres":
+        conn = _sql_connection(layer)
+        if conn is None:
+            raise RuntimeError("no database connection")
+        rows = conn.executeSql(f"WITH u AS (UPDATE {table} SET {assignments} WHERE {where} RETURNING 1) SELECT COUNT(*) FROM u")
+        return int(rows[0][0]) if rows else 0
+    # GDAL registers the ST_* functions used by GeoPackage rtree / SpatiaLite triggers, plain sqlite3 doesn't
+    path = _sqlite_path(layer)
+    ds = ogr.Open(path, 1) if path else None
+    if ds is None:
+        raise RuntimeError(gdal.GetLastErrorMsg() or "cannot open database")
+
+    def run(sql):
+        gdal.ErrorReset()
+        res = ds.ExecuteSQL(sql)
+        if gdal.GetLastErrorType() >= gdal.CE_Failure:
+            if res is not None:
+                ds.ReleaseResultSet(res)
+            raise RuntimeError(gdal.GetLastErrorMsg())
+        return res
 
-class TemplateStore:
+    try:
+        ds.StartTransaction()
+        try:
+            res = run(f"SELECT COUNT(*) FROM {table} WHERE {where}")
+            n = int(res.GetNextFeature().GetField(0)) if res is not None else 0
+            if res is not None:
+                ds.ReleaseResultSet(res)
+            if n:
+                run(f"UPDATE {table} SET {assignments} WHERE {where}")
+        except Exception:
+            ds.RollbackTransaction()
+            raise
+        ds.CommitTransaction()
+        return n
+    finally:
+        ds = None
+
+
+class ConformanceResult:
+    def __init__(self, fields):
+        self.scanned = 0
+        self.mismatches = {name: 0 for name in fields}
+        self.bad = {}  # fid -> [field names]
+
+    @property
+    def fids(self):
+        return list(self.bad.keys())
+
+
+class TemplateConformanceScanner:
+    def __init__(self, layer: QgsVectorLayer, mapping: dict):
+        self.layer = layer
+        self.targets = _template_targets(layer, mapping)
+
+    def scan(self) -> ConformanceResult:
+        result = ConformanceResult([name for _, name, _ in self.targets])
+        if not self.targets:
+            return result
+        req = QgsFeatureRequest()
+        req.setFlags(QgsFeatureRequest.NoGeometry)
+        req.setSubsetOfAttributes([idx for idx, _, _ in self.targets])
+        expected = [(idx, name, value, _comparable(value)) for idx, name, value in self.targets]
+        mismatches = result.mismatches
+        scanned = 0
+        # rows are checked as they stream; only the template's attributes are read from each feature
+        for f in self.layer.getFeatures(req):
+            scanned += 1
+            bad = None
+            for idx, name, raw, exp in expected:
+                v = f.attribute(idx)
+                # cheap equality test first, normalized comparison only for the rest
+                if v != raw and _comparable(v) != exp:
+                    mismatches[name] += 1
+                    if bad is None:
+                        bad = result.bad[f.id()] = []
+                    bad.append(name)
+        result.scanned = scanned
+        return result
+
+
+class LayerKeyIndex:
     def __init__(self):
         self.settings = QSettings()
+        self._keys = {}  # layer id -> storage key
+
+    def _read(self, key, default):
+        self.settings.beginGroup(SETTINGS_GROUP)
+        data = _safe_json_load(self.settings.value(key, ""), default)
+        self.settings.endGroup()
+        return data
+
+    def _write(self, key, data):
+        self.settings.beginGroup(SETTINGS_GROUP)
+        self.settings.setValue(key, json.dumps(data, ensure_ascii=False))
+        self.settings.endGroup()
+        self._keys.clear()
+
+    def key(self, layer: QgsVectorLayer) -> str:
+        lid = layer.id()
+        k = self._keys.get(lid)
+        if k is None:
+            k = self._keys[lid] = self._resolve(_layer_identity(layer))
+        return k
+
+    def _resolve(self, identity: str) -> str:
+        aliases = self._read(ALIASES_KEY, {})
+        if identity in aliases:
+            return aliases[identity]
+        # a layer's own templates win over pattern bindings
+        stored = self._read(TEMPLATES_KEY, {})
+        if identity in stored:
+            return identity
+        for pattern, key in self._read(BINDINGS_KEY, []):
+            if fnmatch.fnmatchcase(identity, pattern):
+                return key
+        # moved file / changed host: relink when exactly one stored dataset has the same name
+        # (for files, only if its old file is gone); ambiguous cases are linked by hand with Link to…
+        short = _short_identity(identity)
+        candidates = [k for k in stored if _short_identity(k) == short]
+        if len(candidates) == 1:
+            provider = candidates[0].partition("::")[0]
+            if provider in DB_PROVIDERS or _identity_file_missing(candidates[0]):
+                self.set_alias(identity, candidates[0])
+                return candidates[0]
+        return identity
+
+    def forget(self, layer_id=None):
+        if layer_id is None:
+            self._keys.clear()
+        else:
+            self._keys.pop(layer_id, None)
+
+    def set_alias(self, identity: str, key: str | None):
+        data = self._read(ALIASES_KEY, {})
+        if key and key != identity:
+            data[identity] = key
+        else:
+            data.pop(identity, None)
+        self._write(ALIASES_KEY, data)
+
+    def add_binding(self, pattern: str, key: str):
+        data = [b for b in self._read(BINDINGS_KEY, []) if b[0] != pattern]
+        data.append([pattern, key])
+        self._write(BINDINGS_KEY, data)
+
+    def bindings(self, identity: str | None = None):
+        data = self._read(BINDINGS_KEY, [])
+        return [b for b in data if identity is None or fnmatch.fnmatchcase(identity, b[0])]
+
+    def remove_binding(self, pattern: str):
+        data = [b for b in self._read(BINDINGS_KEY, []) if b[0] != pattern]
+        self._write(BINDINGS_KEY, data)
+
+
+class TemplateStore:
+    def __init__(self, index: LayerKeyIndex):
+        self.settings = QSettings()
+        self.index = index
+        self._resolved = {}  # (layer key, name) -> (inheritance chain, flattened mapping)
+
+    def _invalidate(self, lk, name=None):
+        stale = [k for k, (chain, _) in self._resolved.items() if k[0] == lk and (name is None or name in chain)]
+        for k in stale:
+            del self._resolved[k]
+
+    @staticmethod
+    def _chain(templates, name):
+        chain = []
+        while name:
+            if name in chain:
+                raise ValueError(tr("inherit_cycle", name=chain[-1], parent=name))
+            chain.append(name)
+            mapping = templates.get(name)
+            name = mapping.get(EXTENDS_KEY) if isinstance(mapping, dict) else None
+        return chain
 
     def _read_all(self):
         self.settings.beginGroup(SETTINGS_GROUP)
@@ -165,27 +640,109 @@ class TemplateStore:
         self.settings.setValue(TEMPLATES_KEY, json.dumps(data, ensure_ascii=False))
         self.settings.endGroup()
 
+    def keys(self):
+        return list(self._read_all().keys())
+
+    def move_key(self, old: str, new: str):
+        data = self._read_all()
+        if old not in data or new in data:
+            return False
+        data[new] = data.pop(old)
+        self._write_all(data)
+        self._invalidate(old)
+        return True
+
     def list_templates(self, layer: QgsVectorLayer):
-        return self._read_all().get(_layer_key(layer), {})
+        return self._read_all().get(self.index.key(layer), {})
+
+    def resolve_template(self, layer: QgsVectorLayer, name: str):
+        lk = self.index.key(layer)
+        cached = self._resolved.get((lk, name))
+        if cached is not None:
+            return cached[1]
+        templates = self.list_templates(layer)
+        if not isinstance(templates.get(name), dict):
+            return None
+        try:
+            chain = self._chain(templates, name)
+        except ValueError:
+            return None
+        flat = {}
+        for n in reversed(chain):
+            mapping = templates.get(n)
+            if not isinstance(mapping, dict):
+                continue
+            flat.update((k, v) for k, v in mapping.items() if not _is_reserved_key(k))
+            for k in mapping.get(UNSET_KEY) or []:
+                flat.pop(k, None)
+            if isinstance(mapping.get(CHILDREN_KEY), dict):
+                flat[CHILDREN_KEY] = dict(flat.get(CHILDREN_KEY, {}), **mapping[CHILDREN_KEY])
+        # missing parents stay in the chain so creating them later invalidates this entry
+        self._resolved[(lk, name)] = (tuple(chain), flat)
+        return flat
 
     def save_template(self, layer: QgsVectorLayer, name: str, mapping: dict):
         data = self._read_all()
-        lk = _layer_key(layer)
+        lk = self.index.key(layer)
         data.setdefault(lk, {})
+        self._chain(dict(data[lk], **{name: mapping}), name)
         data[lk][name] = mapping
         self._write_all(data)
+        self._invalidate(lk, name)
+
+    def rename_template(self, layer: QgsVectorLayer, old: str, new: str, mapping: dict):
+        # rename and save in one write; nothing is stored if the name is taken or the chain cycles
+        data = self._read_all()
+        lk = self.index.key(layer)
+        templates = data.setdefault(lk, {})
+        if new in templates:
+            raise ValueError(tr("name_exists", name=new))
+        templates.pop(old, None)
+        templates[new] = mapping
+        for m in templates.values():
+            if isinstance(m, dict) and m.get(EXTENDS_KEY) == old:
+                m[EXTENDS_KEY] = new
+        for n in templates:
+            self._chain(templates, n)
+        refs = list(self._child_refs(data, layer, old))
+        for _lk, _name, spec in refs:
+            spec["template"] = new
+        self._write_all(data)
+        self._invalidate(lk, old)
+        self._invalidate(lk, new)
+        for ref_lk, ref_name, _spec in refs:
+            self._invalidate(ref_lk, ref_name)
+
+    @staticmethod
+    def _child_refs(data, layer, name):
+        # templates (of any layer) that use this layer's template `name` for their child records
+        rids = {rel.id() for rel in QgsProject.instance().relationManager().referencingRelations(layer)}
+        for lk, templates in data.items():
+            for tname, m in templates.items():
+                children = m.get(CHILDREN_KEY) if isinstance(m, dict) else None
+                for rid, spec in (children or {}).items():
+                    if rid in rids and isinstance(spec, dict) and spec.get("template") == name:
+                        yield lk, tname, spec
+
+    def dependents(self, layer: QgsVectorLayer, name: str):
+        data = self._read_all()
+        templates = data.get(self.index.key(layer), {})
+        names = {n for n, m in templates.items() if isinstance(m, dict) and m.get(EXTENDS_KEY) == name}
+        names.update(n for _lk, n, _spec in self._child_refs(data, layer, name))
+        return names
 
     def delete_template(self, layer: QgsVectorLayer, name: str):
         data = self._read_all()
-        lk = _layer_key(layer)
+        lk = self.index.key(layer)
         if lk in data and name in data[lk]:
             del data[lk][name]
             if not data[lk]:
                 del data[lk]
             self._write_all(data)
+            self._invalidate(lk, name)
 
     def export_layer_templates(self, layer: QgsVectorLayer, path: str):
-        payload = {"layer_key": _layer_key(layer), "layer_name": layer.name(), "templates": self.list_templates(layer)}
+        payload = {"layer_key": self.index.key(layer), "layer_name": layer.name(), "templates": self.list_templates(layer)}
         with open(path, "w", encoding="utf-8") as f:
             json.dump(payload, f, ensure_ascii=False, indent=2)
 
@@ -197,14 +754,18 @@ class TemplateStore:
             return
         current = self.list_templates(layer)
         current = (current | incoming) if merge else incoming
+        for n in current:
+            self._chain(current, n)
         data = self._read_all()
-        data[_layer_key(layer)] = current
+        data[self.index.key(layer)] = current
         self._write_all(data)
+        self._invalidate(self.index.key(layer))
 
 
 class ActiveTemplateStore:
-    def __init__(self):
+    def __init__(self, index: LayerKeyIndex):
         self.settings = QSettings()
+        self.index = index
 
     def _read(self):
         self.settings.beginGroup(SETTINGS_GROUP)
@@ -219,7 +780,7 @@ class ActiveTemplateStore:
 
     def set_active(self, layer: QgsVectorLayer, template_name: str | None):
         data = self._read()
-        lk = _layer_key(layer)
+        lk = self.index.key(layer)
         if template_name:
             data[lk] = template_name
         else:
@@ -227,14 +788,24 @@ class ActiveTemplateStore:
         self._write(data)
 
     def get_active(self, layer: QgsVectorLayer):
-        return self._read().get(_layer_key(layer))
+        return self._read().get(self.index.key(layer))
+
+    def move_key(self, old: str, new: str):
+        data = self._read()
+        if old not in data or new in data:
+            return False
+        data[new] = data.pop(old)
+        self._write(data)
+        return True
 
 
 class TemplateEditorDialog(QDialog):
-    def __init__(self, parent, layer: QgsVectorLayer, name: str = "", mapping: dict | None = None):
+    def __init__(self, parent, layer: QgsVectorLayer, name: str = "", mapping: dict | None = None, parents=(), store=None):
         super().__init__(parent)
         self.layer = layer
+        self.store = store
         self._mapping = mapping or {}
+        self._unset = set(self._mapping.get(UNSET_KEY) or [])
         self._pk = _pk_indexes(layer)
         self.setWindowTitle(tr("template_editor"))
 
@@ -242,20 +813,35 @@ class TemplateEditorDialog(QDialog):
         self.name_combo.setEditable(True)
         self.name_combo.setEditText(name)
 
+        self.extends_combo = QComboBox()
+        self.extends_combo.addItem(tr("none"), None)
+        for p in sorted(parents):
+            if p != name:
+                self.extends_combo.addItem(p, p)
+        idx = self.extends_combo.findData(self._mapping.get(EXTENDS_KEY))
+        self.extends_combo.setCurrentIndex(max(idx, 0))
+
         self.btn_from_selected = QPushButton(tr("from_selected"))
         self.only_checked = QLabel(tr("only_checked") + "\n" + tr("pk_skip"))
         self.only_checked.setWordWrap(True)
 
         self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels([tr("use"), tr("field"), tr("type"), tr("value")])
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels([tr("use"), tr("field"), tr("type"), tr("value"), tr("unset")])
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.table.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.EditKeyPressed)
 
+        self.children_table = QTableWidget()
+        self.children_table.setColumnCount(4)
+        self.children_table.setHorizontalHeaderLabels([tr("use"), tr("relation"), tr("child_template"), tr("count")])
+        self.children_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+
         self._populate()
+        self._populate_children()
 
         form = QFormLayout()
         form.addRow(tr("template_name"), self.name_combo)
+        form.addRow(tr("extends"), self.extends_combo)
 
         btns = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         btns.accepted.connect(self.accept)
@@ -269,6 +855,9 @@ class TemplateEditorDialog(QDialog):
         layout.addLayout(form)
         layout.addLayout(top)
         layout.addWidget(self.table)
+        if self._relations:
+            layout.addWidget(QLabel(tr("children")))
+            layout.addWidget(self.children_table)
         layout.addWidget(self.only_checked)
         layout.addWidget(btns)
         self.setLayout(layout)
@@ -299,8 +888,44 @@ class TemplateEditorDialog(QDialog):
             val = self._mapping.get(f.name(), "")
             self.table.setItem(r, 3, QTableWidgetItem("" if val is None else str(val)))
 
+            unset_cb = QCheckBox()
+            unset_cb.setChecked((f.name() in self._unset) and (not is_pk))
+            unset_cb.setEnabled(not is_pk)
+            use_cb.toggled.connect(lambda on, cb=unset_cb: on and cb.setChecked(False))
+            unset_cb.toggled.connect(lambda on, cb=use_cb: on and cb.setChecked(False))
+            self.table.setCellWidget(r, 4, unset_cb)
+
         self.table.resizeColumnsToContents()
 
+    def _populate_children(self):
+        self._relations = QgsProject.instance().relationManager().referencedRelations(self.layer)
+        declared = self._mapping.get(CHILDREN_KEY) or {}
+        self.children_table.setRowCount(len(self._relations))
+        for r, rel in enumerate(self._relations):
+            spec = declared.get(rel.id()) or {}
+            use_cb = QCheckBox()
+            use_cb.setChecked(rel.id() in declared)
+            self.children_table.setCellWidget(r, 0, use_cb)
+
+            self.children_table.setItem(r, 1, QTableWidgetItem(rel.name() or rel.id()))
+            self.children_table.item(r, 1).setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+
+            tmpl_combo = QComboBox()
+            tmpl_combo.addItem(tr("none"), None)
+            child = rel.referencingLayer()
+            if self.store is not None and child is not None:
+                for n in sorted(self.store.list_templates(child).keys()):
+                    tmpl_combo.addItem(n, n)
+            tmpl_combo.setCurrentIndex(max(tmpl_combo.findData(spec.get("template")), 0))
+            self.children_table.setCellWidget(r, 2, tmpl_combo)
+
+            count_sb = QSpinBox()
+            count_sb.setRange(0, 1000)
+            count_sb.setValue(int(spec.get("count", 1)))
+            self.children_table.setCellWidget(r, 3, count_sb)
+
+        self.children_table.resizeColumnsToContents()
+
     def _fill_from_selected(self):
         sel = self.layer.selectedFeatureIds()
         if not sel:
@@ -328,10 +953,18 @@ class TemplateEditorDialog(QDialog):
             QMessageBox.warning(self, tr("invalid"), tr("missing_name"))
             return None
         mapping = {}
+        parent = self.extends_combo.currentData()
+        if parent:
+            mapping[EXTENDS_KEY] = parent
+        unset = []
         fields = self.layer.fields()
         for r, fld in enumerate(fields):
             if (r in self._pk) or _looks_like_pk_field(fld.name()):
                 continue
+            unset_cb = self.table.cellWidget(r, 4)
+            if isinstance(unset_cb, QCheckBox) and unset_cb.isChecked():
+                unset.append(fld.name())
+                continue
             use_cb = self.table.cellWidget(r, 0)
             use = use_cb.isChecked() if isinstance(use_cb, QCheckBox) else False
             if not use:
@@ -352,6 +985,19 @@ class TemplateEditorDialog(QDialog):
                     mapping[fld.name()] = raw
             except Exception:
                 mapping[fld.name()] = raw
+        if unset:
+            mapping[UNSET_KEY] = unset
+        children = {}
+        for r, rel in enumerate(self._relations):
+            use_cb = self.children_table.cellWidget(r, 0)
+            if not (isinstance(use_cb, QCheckBox) and use_cb.isChecked()):
+                continue
+            children[rel.id()] = {
+                "template": self.children_table.cellWidget(r, 2).currentData(),
+                "count": self.children_table.cellWidget(r, 3).value(),
+            }
+        if children:
+            mapping[CHILDREN_KEY] = children
         return name, mapping
 
 
@@ -375,16 +1021,24 @@ class TemplateDock(QDockWidget):
         self.btn_new = QPushButton(tr("new"))
         self.btn_edit = QPushButton(tr("edit"))
         self.btn_dup = QPushButton(tr("duplicate"))
+        self.btn_derive = QPushButton(tr("derive"))
         self.btn_del = QPushButton(tr("delete"))
 
         self.btn_set_active = QPushButton(tr("set_active"))
         self.btn_clear_active = QPushButton(tr("clear_active"))
         self.btn_apply_selected = QPushButton(tr("apply_selected"))
+        self.btn_check = QPushButton(tr("check_conformance"))
+        self.btn_apply_where = QPushButton(tr("apply_where"))
 
         self.btn_export = QPushButton(tr("export"))
         self.btn_import_merge = QPushButton(tr("import_merge"))
         self.btn_import_replace = QPushButton(tr("import_replace"))
 
+        self.btn_link = QPushButton(tr("link"))
+        self.btn_bind = QPushButton(tr("bind"))
+        self.btn_unlink = QPushButton(tr("unlink"))
+        self.btn_unbind = QPushButton(tr("unbind"))
+
         layout = QVBoxLayout()
 
         lang_row = QHBoxLayout()
@@ -399,7 +1053,7 @@ class TemplateDock(QDockWidget):
         layout.addWidget(self.active_label)
 
         row1 = QHBoxLayout()
-        for b in (self.btn_new, self.btn_edit, self.btn_dup, self.btn_del):
+        for b in (self.btn_new, self.btn_edit, self.btn_dup, self.btn_derive, self.btn_del):
             row1.addWidget(b)
         layout.addLayout(row1)
 
@@ -408,11 +1062,21 @@ class TemplateDock(QDockWidget):
             row2.addWidget(b)
         layout.addLayout(row2)
 
+        row_check = QHBoxLayout()
+        row_check.addWidget(self.btn_check)
+        row_check.addWidget(self.btn_apply_where)
+        layout.addLayout(row_check)
+
         row3 = QHBoxLayout()
         for b in (self.btn_export, self.btn_import_merge, self.btn_import_replace):
             row3.addWidget(b)
         layout.addLayout(row3)
 
+        row4 = QHBoxLayout()
+        for b in (self.btn_link, self.btn_unlink, self.btn_bind, self.btn_unbind):
+            row4.addWidget(b)
+        layout.addLayout(row4)
+
         w.setLayout(layout)
 
         self._load_lang_setting()
@@ -422,13 +1086,20 @@ class TemplateDock(QDockWidget):
         self.btn_new.clicked.connect(self.create_template)
         self.btn_edit.clicked.connect(self.edit_template)
         self.btn_dup.clicked.connect(self.duplicate_template)
+        self.btn_derive.clicked.connect(self.derive_template)
         self.btn_del.clicked.connect(self.delete_template)
         self.btn_set_active.clicked.connect(self.set_active)
         self.btn_clear_active.clicked.connect(self.clear_active)
         self.btn_apply_selected.clicked.connect(self.apply_to_selected)
+        self.btn_check.clicked.connect(self.check_conformance)
+        self.btn_apply_where.clicked.connect(self.apply_where)
         self.btn_export.clicked.connect(self.export_templates)
         self.btn_import_merge.clicked.connect(lambda: self.import_templates(merge=True))
         self.btn_import_replace.clicked.connect(lambda: self.import_templates(merge=False))
+        self.btn_link.clicked.connect(self.link_layer)
+        self.btn_bind.clicked.connect(self.bind_pattern)
+        self.btn_unlink.clicked.connect(self.unlink_layer)
+        self.btn_unbind.clicked.connect(self.unbind_pattern)
 
         self.refresh_layers()
 
@@ -468,6 +1139,7 @@ class TemplateDock(QDockWidget):
         if not layer:
             self.active_label.setText(f"{tr('active')} {tr('none')}")
             return
+        self.layer_combo.setToolTip(self.plugin.layer_index.key(layer))
         templates = self.plugin.store.list_templates(layer)
         for name in sorted(templates.keys()):
             self.template_list.addItem(QListWidgetItem(name))
@@ -482,15 +1154,25 @@ class TemplateDock(QDockWidget):
         layer = self.current_layer()
         if not layer:
             return
-        dlg = TemplateEditorDialog(self, layer)
+        dlg = TemplateEditorDialog(self, layer, parents=self.plugin.store.list_templates(layer).keys(), store=self.plugin.store)
         if dlg.exec_():
             data = dlg.get_data()
             if not data:
                 return
             name, mapping = data
-            self.plugin.store.save_template(layer, name, mapping)
+            self._save(layer, name, mapping, new=True)
             self.refresh_templates()
 
+    def _save(self, layer, name, mapping, new=False):
+        try:
+            if new and name in self.plugin.store.list_templates(layer):
+                raise ValueError(tr("name_exists", name=name))
+            self.plugin.store.save_template(layer, name, mapping)
+            return True
+        except ValueError as e:
+            QMessageBox.warning(self, tr("invalid"), str(e))
+            return False
+
     def edit_template(self):
         layer = self.current_layer()
         if not layer:
@@ -498,17 +1180,24 @@ class TemplateDock(QDockWidget):
         name = self._selected_template_name()
         if not name:
             return
-        mapping = self.plugin.store.list_templates(layer).get(name, {})
-        dlg = TemplateEditorDialog(self, layer, name=name, mapping=mapping)
+        templates = self.plugin.store.list_templates(layer)
+        mapping = templates.get(name, {})
+        dlg = TemplateEditorDialog(self, layer, name=name, mapping=mapping, parents=templates.keys(), store=self.plugin.store)
         if dlg.exec_():
             data = dlg.get_data()
             if not data:
                 return
             new_name, new_mapping = data
-            if new_name != name:
-                self.plugin.store.delete_template(layer, name)
-            self.plugin.store.save_template(layer, new_name, new_mapping)
-            if self.plugin.active_store.get_active(layer) == name and new_name != name:
+            if new_name == name:
+                self._save(layer, name, new_mapping)
+                self.refresh_templates()
+                return
+            try:
+                self.plugin.store.rename_template(layer, name, new_name, new_mapping)
+            except ValueError as e:
+                QMessageBox.warning(self, tr("invalid"), str(e))
+                return
+            if self.plugin.active_store.get_active(layer) == name:
                 self.plugin.active_store.set_active(layer, new_name)
             self.refresh_templates()
 
@@ -522,7 +1211,19 @@ class TemplateDock(QDockWidget):
         mapping = self.plugin.store.list_templates(layer).get(name, {})
         new_name, ok = QInputDialog.getText(self, tr("dup_title"), tr("dup_prompt"), text=f"{name} copy")
         if ok and new_name.strip():
-            self.plugin.store.save_template(layer, new_name.strip(), mapping)
+            self._save(layer, new_name.strip(), mapping, new=True)
+            self.refresh_templates()
+
+    def derive_template(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        name = self._selected_template_name()
+        if not name:
+            return
+        new_name, ok = QInputDialog.getText(self, tr("derive_title"), tr("dup_prompt"), text=f"{name} variant")
+        if ok and new_name.strip():
+            self._save(layer, new_name.strip(), {EXTENDS_KEY: name}, new=True)
             self.refresh_templates()
 
     def delete_template(self):
@@ -532,6 +1233,10 @@ class TemplateDock(QDockWidget):
         name = self._selected_template_name()
         if not name:
             return
+        dependents = self.plugin.store.dependents(layer, name)
+        if dependents:
+            QMessageBox.warning(self, tr("delete"), tr("delete_in_use", name=name, names=", ".join(sorted(dependents))))
+            return
         if QMessageBox.question(self, tr("delete"), tr("delete_q", name=name)) != QMessageBox.Yes:
             return
         self.plugin.store.delete_template(layer, name)
@@ -567,6 +1272,30 @@ class TemplateDock(QDockWidget):
             return
         self.plugin.apply_template_to_selected(layer, name)
 
+    def check_conformance(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        name = self._selected_template_name() or self.plugin.active_store.get_active(layer)
+        if not name:
+            QMessageBox.information(self, "Info", tr("no_template"))
+            return
+        self.plugin.check_template_conformance(layer, name)
+
+    def apply_where(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        name = self._selected_template_name() or self.plugin.active_store.get_active(layer)
+        if not name:
+            QMessageBox.information(self, "Info", tr("no_template"))
+            return
+        dlg = QgsExpressionBuilderDialog(layer, "", self)
+        dlg.setWindowTitle(tr("apply_where_title"))
+        if not dlg.exec_() or not dlg.expressionText().strip():
+            return
+        self.plugin.apply_template_where(layer, name, dlg.expressionText())
+
     def export_templates(self):
         layer = self.current_layer()
         if not layer:
@@ -594,15 +1323,74 @@ class TemplateDock(QDockWidget):
         except Exception as e:
             QMessageBox.critical(self, tr("import_failed"), str(e))
 
+    def link_layer(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        current = self.plugin.layer_index.key(layer)
+        short = _short_identity(_layer_identity(layer))
+        # datasets with the same name (moved file, other server) are listed first
+        keys = sorted((k for k in self.plugin.store.keys() if k != current), key=lambda k: (_short_identity(k) != short, k))
+        if not keys:
+            return
+        key, ok = QInputDialog.getItem(self, tr("link_title"), tr("link_prompt"), keys, 0, False)
+        if ok and key:
+            self.plugin.layer_index.set_alias(_layer_identity(layer), key)
+            self.refresh_templates()
+
+    def bind_pattern(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        identity = _layer_identity(layer)
+        pattern, ok = QInputDialog.getText(self, tr("bind_title"), tr("bind_prompt", identity=identity), text=identity)
+        if ok and pattern.strip():
+            pattern = pattern.strip()
+            self.plugin.layer_index.add_binding(pattern, self.plugin.layer_index.key(layer))
+            stored = set(self.plugin.store.keys())
+            own = [
+                lyr.name() for lyr in QgsProject.instance().mapLayers().values()
+                if isinstance(lyr, QgsVectorLayer) and lyr.id() != layer.id()
+                and fnmatch.fnmatchcase(_layer_identity(lyr), pattern) and _layer_identity(lyr) in stored
+            ]
+            if own:
+                QMessageBox.information(self, tr("bind_title"), tr("bind_shadowed", n=len(own), names=", ".join(sorted(own))))
+            self.refresh_templates()
+
+    def unlink_layer(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        self.plugin.layer_index.set_alias(_layer_identity(layer), None)
+        self.refresh_templates()
+
+    def unbind_pattern(self):
+        layer = self.current_layer()
+        if not layer:
+            return
+        bindings = self.plugin.layer_index.bindings(_layer_identity(layer))
+        if not bindings:
+            QMessageBox.information(self, "Info", tr("no_bindings"))
+            return
+        items = [f"{pattern}  →  {key}" for pattern, key in bindings]
+        item, ok = QInputDialog.getItem(self, tr("unbind_title"), tr("unbind_prompt"), items, 0, False)
+        if ok and item:
+            self.plugin.layer_index.remove_binding(bindings[items.index(item)][0])
+            self.refresh_templates()
+
 
 class AttributeTemplateFillerPlugin:
     def __init__(self, iface):
         self.iface = iface
         self.action = None
         self.dock = None
-        self.store = TemplateStore()
-        self.active_store = ActiveTemplateStore()
+        self.layer_index = LayerKeyIndex()
+        self.store = TemplateStore(self.layer_index)
+        self.active_store = ActiveTemplateStore(self.layer_index)
         self._connected = set()
+        self._slots = {}  # layer id -> [(signal name, slot)], disconnected individually on unload
+        self._pending_children = {}  # layer id -> {fid: template name}, created once the parent is committed
+        self._commit = {}  # layer id -> {"deleted": last temporary fid, "ready": {fid: template name}}
 
     def initGui(self):
         self.action = QAction(QIcon(self._icon_path()), tr("dock_title"), self.iface.mainWindow())
@@ -631,7 +1419,6 @@ class AttributeTemplateFillerPlugin:
             self.action = None
 
     def _icon_path(self):
-        import os
         return os.path.join(os.path.dirname(__file__), "icon.png")
 
     def _toggle(self, checked):
@@ -657,6 +1444,12 @@ class AttributeTemplateFillerPlugin:
         except Exception:
             pass
 
+    def _resolve(self, layer, template_name):
+        mapping = self.store.resolve_template(layer, template_name)
+        if mapping is None:
+            self._warn(tr("template_unresolved", name=template_name))
+        return mapping
+
     def _connect_existing(self):
         for lyr in QgsProject.instance().mapLayers().values():
             self._connect_layer(lyr)
@@ -669,6 +1462,11 @@ class AttributeTemplateFillerPlugin:
 
     def _on_layers_removed(self, layer_ids):
         self._connected = {lid for lid in self._connected if lid not in set(layer_ids)}
+        for lid in layer_ids:
+            self.layer_index.forget(lid)
+            self._slots.pop(lid, None)
+            self._pending_children.pop(lid, None)
+            self._commit.pop(lid, None)
         if self.dock:
             self.dock.refresh_layers()
 
@@ -677,42 +1475,102 @@ class AttributeTemplateFillerPlugin:
             return
         if layer.id() in self._connected:
             return
-        layer.featureAdded.connect(lambda fid, lyr=layer: self._on_feature_added(lyr, fid))
+        slots = [
+            ("featureAdded", lambda fid, lyr=layer: self._on_feature_added(lyr, fid)),
+            ("featureDeleted", lambda fid, lyr=layer: self._on_feature_deleted(lyr, fid)),
+            ("dataSourceChanged", lambda lyr=layer: self._index_layer(lyr)),
+            ("beforeCommitChanges", lambda *args, lyr=layer: self._on_before_commit(lyr)),
+            ("afterCommitChanges", lambda lyr=layer: self._on_after_commit(lyr)),
+            ("afterRollBack", lambda lyr=layer: self._pending_children.pop(lyr.id(), None)),
+        ]
+        for signal, slot in slots:
+            getattr(layer, signal).connect(slot)
+        self._slots[layer.id()] = slots
         self._connected.add(layer.id())
+        self._index_layer(layer)
+
+    def _index_layer(self, layer):
+        # resolved once per layer load; templates saved under the old source-based key are moved over
+        self.layer_index.forget(layer.id())
+        key = self.layer_index.key(layer)
+        legacy = _legacy_layer_key(layer)
+        if legacy != key:
+            self.store.move_key(legacy, key)
+            self.active_store.move_key(legacy, key)
 
     def _disconnect_all(self):
         for lyr in QgsProject.instance().mapLayers().values():
             if isinstance(lyr, QgsVectorLayer):
-                try:
-                    lyr.featureAdded.disconnect()
-                except Exception:
-                    pass
+                for signal, slot in self._slots.get(lyr.id(), []):
+                    try:
+                        getattr(lyr, signal).disconnect(slot)
+                    except Exception:
+                        pass
         self._connected.clear()
+        self._slots.clear()
 
     def _on_feature_added(self, layer, fid):
+        commit = self._commit.get(layer.id())
+        if commit is not None:
+            # during commit QGIS re-emits added features as featureDeleted(temporary) + featureAdded(permanent)
+            name = self._pending_children.get(layer.id(), {}).pop(commit.pop("deleted", None), None)
+            if name:
+                commit["ready"][fid] = name
+            return
         name = self.active_store.get_active(layer)
         if not name:
             return
-        ok = self.apply_template_to_feature(layer, fid, name)
+        ok = self.apply_template_to_feature(layer, fid, name, children=False)
         if ok:
             self._info(tr("auto_applied", name=name))
-
-    def apply_template_to_feature(self, layer, fid, template_name):
-        mapping = self.store.list_templates(layer).get(template_name)
+        mapping = self.store.resolve_template(layer, name)
+        if mapping and mapping.get(CHILDREN_KEY):
+            # digitized, pasted and bulk-added parents are all queued; a redo only re-queues the same fid
+            self._pending_children.setdefault(layer.id(), {})[fid] = name
+
+    def _on_feature_deleted(self, layer, fid):
+        commit = self._commit.get(layer.id())
+        if commit is not None:
+            commit["deleted"] = fid
+        else:  # undo of an add, or a real delete
+            self._pending_children.get(layer.id(), {}).pop(fid, None)
+
+    def _on_before_commit(self, layer):
+        # also keeps the template from being re-applied to features QGIS re-emits while committing
+        self._commit[layer.id()] = {"ready": {}}
+        # afterCommitChanges isn't emitted when the commit fails, so drop the state once commitChanges() returns
+        QTimer.singleShot(0, lambda lid=layer.id(): self._commit.pop(lid, None))
+
+    def _on_after_commit(self, layer):
+        commit = self._commit.pop(layer.id(), None)
+        pending = self._pending_children.pop(layer.id(), {})
+        if commit is None:
+            return
+        ready = commit["ready"]
+        # providers that keep the temporary id don't re-emit the feature
+        ready.update((fid, name) for fid, name in pending.items() if layer.getFeature(fid).isValid())
+        by_template = {}
+        for fid, name in ready.items():
+            by_template.setdefault(name, []).append(fid)
+        created = 0
+        for name, fids in by_template.items():
+            mapping = self._resolve(layer, name)
+            if mapping:
+                created += self._add_child_features(layer, fids, mapping, name)
+        if created:
+            self._info(tr("children_added", n=created))
+
+    def apply_template_to_feature(self, layer, fid, template_name, children=True):
+        mapping = self._resolve(layer, template_name)
         if not isinstance(mapping, dict) or not layer.isEditable():
             return False
-        fields = layer.fields()
-        pk = _pk_indexes(layer)
         applied_any = False
-        for field_name, value in mapping.items():
-            idx = fields.indexOf(field_name)
-            if idx < 0:
-                continue
-            if idx in pk or _looks_like_pk_field(field_name):
-                continue
+        for idx, _field_name, value in _template_targets(layer, mapping):
             v = QVariant() if value is None else value
             if layer.changeAttributeValue(fid, idx, v):
                 applied_any = True
+        if children and self._add_child_features(layer, [fid], mapping, template_name):
+            applied_any = True
         if not applied_any:
             self._warn(tr("warn_no_fields"))
             return False
@@ -727,22 +1585,262 @@ class AttributeTemplateFillerPlugin:
         if not ids:
             QMessageBox.information(self.iface.mainWindow(), "Info", tr("no_selection"))
             return
-        mapping = self.store.list_templates(layer).get(template_name)
+        mapping = self._resolve(layer, template_name)
         if not isinstance(mapping, dict):
             return
-        fields = layer.fields()
-        pk = _pk_indexes(layer)
+        values = {idx: (QVariant() if value is None else value) for idx, _, value in _template_targets(layer, mapping)}
         n = 0
-        for fid in ids:
-            applied_any = False
-            for field_name, value in mapping.items():
-                idx = fields.indexOf(field_name)
-                if idx < 0:
-                    continue
-                v = QVariant() if value is None else value
-                if layer.changeAttributeValue(fid, idx, v):
-                    applied_any = True
-            if applied_any:
-                n += 1
+        layer.beginEditCommand(f"{tr('apply_selected')}: {template_name}")
+        try:
+            if values:
+                n = sum(1 for fid in ids if layer.changeAttributeValues(fid, values))
+            children = self._add_child_features(layer, ids, mapping, template_name)
+        except Exception:
+            layer.destroyEditCommand()
+            raise
+        layer.endEditCommand()
         layer.triggerRepaint()
         self._info(tr("applied", name=template_name, n=n))
+        if children:
+            self._info(tr("children_added", n=children))
+
+    def _add_child_features(self, layer, fids, mapping, template_name):
+        # one addFeatures() per child layer for all parents
+        children = mapping.get(CHILDREN_KEY) or {}
+        if not children or not fids:
+            return 0
+        manager = QgsProject.instance().relationManager()
+        total = 0
+        for rid, spec in children.items():
+            rel = manager.relation(rid)
+            count = int((spec or {}).get("count", 1) or 0)
+            if not rel.isValid() or count <= 0 or rel.referencedLayerId() != layer.id():
+                continue
+            child = rel.referencingLayer()
+            child_mapping = self._resolve(child, spec["template"]) if spec.get("template") else {}
+            if child_mapping is None:
+                continue
+            pairs = list(rel.fieldPairs().items())  # (referencing field, referenced field)
+            child_fields = child.fields()
+            fk_idx = [child_fields.indexOf(fk) for fk, _ in pairs]
+            if any(i < 0 for i in fk_idx):
+                continue
+            base = {idx: (QVariant() if value is None else value) for idx, _, value in _template_targets(child, child_mapping)}
+            req = QgsFeatureRequest().setFilterFids(list(fids))
+            req.setFlags(QgsFeatureRequest.NoGeometry)
+            req.setSubsetOfAttributes([ref for _, ref in pairs], layer.fields())
+            # an unsaved parent may hold the provider's default clause (e.g. nextval(...)) instead of a key
+            clauses = [layer.dataProvider().defaultValueClause(layer.fields().indexOf(ref)) for _, ref in pairs]
+            parent_keys = []
+            missing = 0
+            for parent in layer.getFeatures(req):
+                keys = [parent[ref] for _, ref in pairs]
+                if any(_is_null(k) or (c and k == c) for k, c in zip(keys, clauses)):
+                    missing += 1
+                    continue
+                parent_keys.append(keys)
+            if missing:
+                self._warn(tr("children_no_key", n=missing, relation=rel.name() or rid))
+            # re-applying a template must not duplicate children, so parents that already have some are skipped
+            existing = self._existing_child_keys(child, [fk for fk, _ in pairs], parent_keys)
+            feats = []
+            skipped = 0
+            for keys in parent_keys:
+                if tuple(_comparable(k) for k in keys) in existing:
+                    skipped += 1
+                    continue
+                attrs = dict(base)
+                attrs.update(zip(fk_idx, keys))
+                feats.extend(QgsVectorLayerUtils.createFeature(child, QgsGeometry(), attrs) for _ in range(count))
+            if skipped:
+                self._info(tr("children_exist", n=skipped, relation=rel.name() or rid))
+            if not feats:
+                continue
+            if not child.isEditable() and not child.startEditing():
+                self._warn(tr("child_not_editable", layer=child.name()))
+                continue
+            child.beginEditCommand(f"{tr('children')} {template_name}")
+            if child.addFeatures(feats):
+                child.endEditCommand()
+                total += len(feats)
+            else:
+                child.destroyEditCommand()
+            child.triggerRepaint()
+        return total
+
+    @staticmethod
+    def _existing_child_keys(child, fk_names, parent_keys):
+        found = set()
+        refs = [QgsExpression.quotedColumnRef(n) for n in fk_names]
+        for start in range(0, len(parent_keys), CHILD_LOOKUP_CHUNK):
+            chunk = parent_keys[start:start + CHILD_LOOKUP_CHUNK]
+            if len(refs) == 1:
+                expr = f"{refs[0]} IN ({', '.join(QgsExpression.quotedValue(k[0]) for k in chunk)})"
+            else:
+                expr = " OR ".join(
+                    "(" + " AND ".join(f"{r} = {QgsExpression.quotedValue(v)}" for r, v in zip(refs, keys)) + ")"
+                    for keys in chunk
+                )
+            req = QgsFeatureRequest().setFilterExpression(expr)
+            req.setFlags(QgsFeatureRequest.NoGeometry)
+            req.setSubsetOfAttributes(fk_names, child.fields())
+            for f in child.getFeatures(req):
+                found.add(tuple(_comparable(f[n]) for n in fk_names))
+        return found
+
+    def check_template_conformance(self, layer, template_name):
+        mapping = self._resolve(layer, template_name)
+        if not isinstance(mapping, dict):
+            return None
+        scanner = TemplateConformanceScanner(layer, mapping)
+        if not scanner.targets:
+            self._warn(tr("warn_no_fields"))
+            return None
+        result = scanner.scan()
+        parent = self.iface.mainWindow()
+        if not result.bad:
+            QMessageBox.information(parent, "OK", tr("conformance_ok", name=template_name, n=result.scanned))
+            return result
+        layer.selectByIds(result.fids)
+        details = "\n".join(f"{fname}: {cnt}" for fname, cnt in sorted(result.mismatches.items()) if cnt)
+        QMessageBox.information(parent, "Info", tr("conformance_bad", name=template_name, bad=len(result.bad), n=result.scanned, details=details))
+        if QMessageBox.question(parent, tr("check_conformance"), tr("create_report_q")) == QMessageBox.Yes:
+            self._create_conformance_report(layer, template_name, result)
+        return result
+
+    def _create_conformance_report(self, layer, template_name, result):
+        report = QgsVectorLayer("None", f"{layer.name()} - {tr('report_layer', name=template_name)}", "memory")
+        pr = report.dataProvider()
+        pr.addAttributes([
+            QgsField("source_fid", QVariant.LongLong),
+            QgsField("template", QVariant.String),
+            QgsField("fields", QVariant.String),
+            QgsField("mismatches", QVariant.Int),
+        ])
+        report.updateFields()
+        feats = []
+        for fid, names in result.bad.items():
+            f = QgsFeature(report.fields())
+            f.setAttributes([fid, template_name, ", ".join(names), len(names)])
+            feats.append(f)
+        pr.addFeatures(feats)
+        report.updateExtents()
+        QgsProject.instance().addMapLayer(report)
+        return report
+
+    def apply_template_where(self, layer, template_name, expression_text):
+        parent = self.iface.mainWindow()
+        mapping = self._resolve(layer, template_name)
+        if not isinstance(mapping, dict):
+            return None
+        targets = _template_targets(layer, mapping)
+        if not targets and not mapping.get(CHILDREN_KEY):
+            self._warn(tr("warn_no_fields"))
+            return None
+        expression = QgsExpression(expression_text)
+        if expression.hasParserError():
+            QMessageBox.warning(parent, tr("invalid"), tr("invalid_expression", error=expression.parserErrorString()))
+            return None
+        if not layer.isEditable():
+            if mapping.get(CHILDREN_KEY):
+                # child records are created in the edit buffer, not by an UPDATE
+                QMessageBox.information(parent, "Info", tr("children_need_editing"))
+                return None
+            try:
+                n = self._apply_where_pushdown(layer, targets, expression)
+            except Exception as e:
+                self._warn(tr("pushdown_failed", error=str(e)))
+                n = None
+            if n is not None:
+                self._info(tr("applied_db", name=template_name, n=n))
+                return n
+            n = self._apply_where_provider(layer, targets, expression)
+            if n is None:
+                QMessageBox.information(parent, "Info", tr("layer_not_editable"))
+                return None
+            self._info(tr("applied", name=template_name, n=n))
+            return n
+        n = self._apply_where_buffered(layer, targets, expression, template_name, mapping)
+        self._info(tr("applied", name=template_name, n=n))
+        return n
+
+    def _apply_where_pushdown(self, layer, targets, expression):
+        if layer.providerType() not in PUSHDOWN_PROVIDERS:
+            return None
+        if not (layer.dataProvider().capabilities() & QgsVectorDataProvider.ChangeAttributeValues):
+            return None
+        table = _sql_table(layer)
+        where = _expression_to_sql(expression, layer)
+        if not table or not where:
+            return None
+        assignments = []
+        for _idx, field_name, value in targets:
+            lit = _sql_literal(value, layer.providerType())
+            if lit is None:
+                return None
+            assignments.append(f"{QgsExpression.quotedColumnRef(field_name)} = {lit}")
+        subset = layer.subsetString().strip()
+        if subset:
+            where = f"{where} AND ({subset})"
+        n = _sql_update(layer, table, ", ".join(assignments), where)
+        layer.dataProvider().reloadData()
+        layer.triggerRepaint()
+        return n
+
+    @staticmethod
+    def _where_request(layer, expression):
+        req = QgsFeatureRequest(expression)
+        req.setExpressionContext(QgsExpressionContext(QgsExpressionContextUtils.globalProjectLayerScopes(layer)))
+        if not expression.needsGeometry():
+            req.setFlags(QgsFeatureRequest.NoGeometry)
+        req.setSubsetOfAttributes(expression.referencedColumns(), layer.fields())
+        return req
+
+    def _apply_where_provider(self, layer, targets, expression):
+        # non-SQL fallback for layers that aren't being edited: one provider call per chunk of fids
+        provider = layer.dataProvider()
+        if not (provider.capabilities() & QgsVectorDataProvider.ChangeAttributeValues):
+            return None
+        values = {idx: (QVariant() if value is None else value) for idx, _, value in targets}
+        n = 0
+        chunk = []
+        for f in layer.getFeatures(self._where_request(layer, expression)):
+            chunk.append(f.id())
+            if len(chunk) >= APPLY_CHUNK_SIZE:
+                n += self._change_provider_chunk(provider, chunk, values)
+                chunk = []
+        n += self._change_provider_chunk(provider, chunk, values)
+        provider.reloadData()
+        layer.triggerRepaint()
+        return n
+
+    @staticmethod
+    def _change_provider_chunk(provider, fids, values):
+        if not fids or not values:
+            return len(fids)
+        return len(fids) if provider.changeAttributeValues({fid: values for fid in fids}) else 0
+
+    def _apply_where_buffered(self, layer, targets, expression, template_name, mapping):
+        values = {idx: (QVariant() if value is None else value) for idx, _, value in targets}
+        n = 0
+        matched = [] if mapping.get(CHILDREN_KEY) else None
+        layer.beginEditCommand(f"{tr('apply_where_title')}: {template_name}")
+        try:
+            # the edit buffer only takes per-feature changes; the iterator works on a snapshot of it,
+            # so changing values while streaming is safe
+            for f in layer.getFeatures(self._where_request(layer, expression)):
+                fid = f.id()
+                if matched is not None:
+                    matched.append(fid)
+                if not values or layer.changeAttributeValues(fid, values):
+                    n += 1
+            if matched:
+                children = self._add_child_features(layer, matched, mapping, template_name)
+                if children:
+                    self._info(tr("children_added", n=children))
+        except Exception:
+            layer.destroyEditCommand()
+            raise
+        layer.endEditCommand()
+        layer.triggerRepaint()
+        return n